@@ -1,13 +1,66 @@
 import argparse
 import configparser
 import os
-import random
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import List, Optional
 
-from influxdb_client import InfluxDBClient, Point
+import numpy as np
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.write_api import SYNCHRONOUS
 
-@dataclass
+# Rounded-key fitness memo: 6 digits is GA-relevant precision, and the
+# cap keeps long multi-run processes from growing the cache unbounded.
+_CACHE_DIGITS = 6
+_CACHE_LIMIT = 65536
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy path is used without it
+    njit = None
+
+
+def _fitness_kernel(population, risk_vec, ret_vec):
+    out = np.empty(population.shape[0])
+    for i in range(population.shape[0]):
+        R = 0.0
+        G = 0.0
+        for j in range(population.shape[1]):
+            R += population[i, j] * risk_vec[j]
+            G += population[i, j] * ret_vec[j]
+        denom = (1.0 - R) + G
+        if denom == 0.0:
+            out[i] = -np.inf
+        else:
+            out[i] = (2.0 * (1.0 - R) * G) / denom
+    return out
+
+
+if njit is not None:
+    _fitness_kernel = njit(cache=True)(_fitness_kernel)
+
+
+# Asset arrays for worker processes, sent once via the pool initializer
+# instead of being pickled with every task.
+_worker_risk = None
+_worker_ret = None
+
+
+def _init_fitness_worker(risk_vec, ret_vec):
+    global _worker_risk, _worker_ret
+    _worker_risk = risk_vec
+    _worker_ret = ret_vec
+
+
+def _fitness_batch(population):
+    R = population @ _worker_risk
+    G = population @ _worker_ret
+    denom = (1 - R) + G
+    Opt = np.full_like(denom, -np.inf)
+    np.divide(2 * (1 - R) * G, denom, out=Opt, where=denom != 0)
+    return Opt
+
+@dataclass(frozen=True, slots=True)
 class Asset:
     name: str
     expected_return: float
@@ -18,6 +71,9 @@ class GeneticAlgorithm:
                  generations: int = 200, crossover_rate: float = 0.7,
                  mutation_rate: float = 0.1, elitism: int = 2,
                  selection_type: str = "roulette",
+                 n_workers: int = 1,
+                 patience: int = 20,
+                 seed: Optional[int] = None,
                  influx_client: Optional[InfluxDBClient] = None,
                  bucket: str = "",
                  org: str = ""):
@@ -28,88 +84,215 @@ class GeneticAlgorithm:
         self.mutation_rate = mutation_rate
         self.elitism = elitism
         self.selection_type = selection_type
+        self.n_workers = n_workers
+        self.patience = patience
         self.influx_client = influx_client
         self.bucket = bucket
         self.org = org
-        self.write_api = influx_client.write_api() if influx_client else None
+        # Synchronous API: points are buffered locally and flushed in one
+        # blocking write, so the background-batching default would only
+        # enqueue them and drop everything at interpreter exit.
+        self.write_api = (influx_client.write_api(write_options=SYNCHRONOUS)
+                          if influx_client else None)
         self.chromosome_length = len(assets)
+        # Struct-of-arrays view of the assets so fitness is a dot product
+        # instead of a Python loop over dataclass attributes.
+        self.risk_vec = np.array([a.risk for a in assets], dtype=np.float64)
+        self.ret_vec = np.array([a.expected_return for a in assets], dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+        if self.chromosome_length == 5:
+            # The CLI always supplies exactly five assets; bind an unrolled
+            # kernel so scalar scoring skips loop and array dispatch.
+            self._fitness = self._build_fitness_k5()
+        self._fitness_cache = {}
+        # Field keys escaped once for raw line protocol; cheaper than
+        # rebuilding a Point object every generation.
+        self._field_keys = [
+            a.name.replace(",", r"\,").replace(" ", r"\ ").replace("=", r"\=")
+            for a in assets
+        ]
+        self._pending_lines = []
+        # Optional master/slave evaluation: the fitness here is cheap, but a
+        # heavier scoring function swapped in scales with the worker count.
+        self._executor = None
+        if n_workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_fitness_worker,
+                initargs=(self.risk_vec, self.ret_vec))
 
-    def _random_chromosome(self) -> List[float]:
-        weights = [random.random() for _ in range(self.chromosome_length)]
-        total = sum(weights)
-        return [w / total for w in weights]
+    def __del__(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
 
-    def _fitness(self, chromosome: List[float]) -> float:
-        R = sum(w * a.risk for w, a in zip(chromosome, self.assets))
-        G = sum(w * a.expected_return for w, a in zip(chromosome, self.assets))
+    def _init_population(self) -> np.ndarray:
+        pop = self.rng.random((self.population_size, self.chromosome_length))
+        pop /= pop.sum(axis=1, keepdims=True)
+        return pop
+
+    def _fitness(self, chromosome: np.ndarray) -> float:
+        R = float(np.dot(chromosome, self.risk_vec))
+        G = float(np.dot(chromosome, self.ret_vec))
         if (1 - R + G) == 0:
             return float('-inf')  # avoid division by zero
         Opt = (2 * (1 - R) * G) / ((1 - R) + G)
         return Opt
 
-    def _log_generation(self, generation: int, best: List[float], score: float):
+    def _build_fitness_k5(self):
+        r0, r1, r2, r3, r4 = (float(r) for r in self.risk_vec)
+        g0, g1, g2, g3, g4 = (float(g) for g in self.ret_vec)
+
+        def _fitness_k5(chromosome) -> float:
+            w0, w1, w2, w3, w4 = chromosome
+            R = w0 * r0 + w1 * r1 + w2 * r2 + w3 * r3 + w4 * r4
+            G = w0 * g0 + w1 * g1 + w2 * g2 + w3 * g3 + w4 * g4
+            if (1 - R + G) == 0:
+                return float('-inf')  # avoid division by zero
+            return (2 * (1 - R) * G) / ((1 - R) + G)
+
+        return _fitness_k5
+
+    def _fitness_pop(self, population: np.ndarray) -> np.ndarray:
+        """Score a whole ``(n, chromosome_length)`` block in one pass."""
+        if self._executor is not None:
+            chunks = np.array_split(population, self.n_workers)
+            return np.concatenate(list(self._executor.map(_fitness_batch, chunks)))
+        if njit is not None:
+            return _fitness_kernel(np.ascontiguousarray(population),
+                                   self.risk_vec, self.ret_vec)
+        R = population @ self.risk_vec
+        G = population @ self.ret_vec
+        denom = (1 - R) + G
+        # Masked divide: zero denominators keep the -inf fill with no
+        # Python branch or suppressed-warning pass.
+        Opt = np.full_like(denom, -np.inf)
+        np.divide(2 * (1 - R) * G, denom, out=Opt, where=denom != 0)
+        return Opt
+
+    def _grade(self, population: np.ndarray) -> np.ndarray:
+        # Chromosomes are immutable between evaluations, so elites and
+        # near-duplicate children never need to be re-scored; only cache
+        # misses go through the batched evaluation.
+        cache = self._fitness_cache
+        keys = np.round(population, _CACHE_DIGITS)
+        fitnesses = np.empty(len(population))
+        misses = []
+        for i in range(len(population)):
+            cached = cache.get(keys[i].tobytes())
+            if cached is None:
+                misses.append(i)
+            else:
+                fitnesses[i] = cached
+        if misses:
+            fitnesses[misses] = self._fitness_pop(population[misses])
+            for i in misses:
+                cache[keys[i].tobytes()] = float(fitnesses[i])
+                if len(cache) > _CACHE_LIMIT:
+                    # Evict the oldest entry; insertion order approximates
+                    # recency well enough for a converging population.
+                    del cache[next(iter(cache))]
+        return fitnesses
+
+    def _log_generation(self, generation: int, best: np.ndarray, score: float):
         if not self.write_api:
             return
-        point = Point("genetic_algorithm").tag("generation", generation)
-        for asset, weight in zip(self.assets, best):
-            point.field(asset.name, float(weight))
-        point.field("score", float(score))
+        fields = ",".join(
+            f"{key}={float(weight)}"
+            for key, weight in zip(self._field_keys, best))
+        # Buffer locally; one batched write at the end of the run replaces
+        # a blocking HTTP round-trip per generation.
+        self._pending_lines.append(
+            f"genetic_algorithm,generation={generation} {fields},score={float(score)}")
+
+    def _flush_points(self):
+        if not self.write_api or not self._pending_lines:
+            return
         try:
-            self.write_api.write(bucket=self.bucket, org=self.org, record=point)
+            self.write_api.write(bucket=self.bucket, org=self.org,
+                                 record="\n".join(self._pending_lines))
         except Exception:
             pass
+        self._pending_lines = []
 
-    def _mutate(self, chromosome: List[float]):
-        idx = random.randrange(self.chromosome_length)
-        change = random.uniform(-0.1, 0.1)
-        chromosome[idx] = max(0.0, min(1.0, chromosome[idx] + change))
-        total = sum(chromosome)
-        if total == 0:
-            chromosome[idx] = 1.0
-            total = 1.0
-        for i in range(self.chromosome_length):
-            chromosome[i] /= total
-
-    def _crossover(self, parent1: List[float], parent2: List[float]) -> List[float]:
-        if random.random() > self.crossover_rate:
-            child = parent1[:]
-        else:
-            alpha = random.random()
-            child = [alpha * g1 + (1 - alpha) * g2 for g1, g2 in zip(parent1, parent2)]
-        total = sum(child)
-        child = [c / total for c in child]
-        return child
+    def _step(self, fitnesses: np.ndarray, next_pop: np.ndarray):
+        """Build the next generation into ``next_pop`` with array ops only."""
+        n_children = self.population_size - self.elitism
+        if self.elitism:
+            # Selection only needs per-index fitness, so pick the top-K
+            # elites in O(n) instead of fully sorting the population.
+            elite_idx = np.argpartition(fitnesses, -self.elitism)[-self.elitism:]
+            next_pop[:self.elitism] = self.pop[elite_idx]
+        parents = self._select_parents(fitnesses, n_children)
+        alphas = self.rng.random(n_children)
+        # A skipped crossover copies parent1, which is the alpha == 1 blend.
+        alphas[self.rng.random(n_children) > self.crossover_rate] = 1.0
+        # Both parents sum to 1 and the blend is convex, so children are
+        # already on the simplex; no renormalization needed.
+        children = (alphas[:, None] * self.pop[parents[:, 0]]
+                    + (1.0 - alphas[:, None]) * self.pop[parents[:, 1]])
+        mutants = np.flatnonzero(self.rng.random(n_children) < self.mutation_rate)
+        if mutants.size:
+            idx = self.rng.integers(0, self.chromosome_length, size=mutants.size)
+            changes = self.rng.uniform(-0.1, 0.1, size=mutants.size)
+            children[mutants, idx] = np.clip(children[mutants, idx] + changes,
+                                             0.0, 1.0)
+            totals = children[mutants].sum(axis=1)
+            zeroed = totals == 0
+            if zeroed.any():
+                children[mutants[zeroed], idx[zeroed]] = 1.0
+                totals[zeroed] = 1.0
+            children[mutants] /= totals[:, None]
+        next_pop[self.elitism:] = children
 
-    def _select_parent(self, graded: List[List[float]]) -> List[float]:
+    def _select_parents(self, fitnesses: np.ndarray, needed: int) -> np.ndarray:
+        """Draw ``(needed, 2)`` parent indices for the whole generation at once."""
+        n = self.population_size
         if self.selection_type == "tournament":
-            competitors = random.sample(graded, k=min(3, len(graded)))
-            return max(competitors, key=self._fitness)
+            entrants = self.rng.integers(0, n, size=(needed, 2, 3))
+            winners = np.argmax(fitnesses[entrants], axis=2)
+            return np.take_along_axis(entrants, winners[..., None], axis=2)[..., 0]
         # roulette selection
-        fitnesses = [self._fitness(ch) for ch in graded]
-        min_f = min(fitnesses)
-        weights = [f - min_f + 1e-6 for f in fitnesses]
-        return random.choices(graded, weights=weights, k=1)[0]
+        weights = fitnesses - fitnesses.min() + 1e-6
+        weights /= weights.sum()
+        return self.rng.choice(n, size=(needed, 2), p=weights)
 
     def run(self):
-        population = [self._random_chromosome() for _ in range(self.population_size)]
+        self.pop = self._init_population()
+        # Double buffer for the next generation: _step fills it, then the
+        # two arrays swap roles, so a whole run touches exactly two
+        # allocations and never copies a population.
+        next_pop = np.empty_like(self.pop)
+        prev_best = float('-inf')
+        stale = 0
+        gen = -1
         for gen in range(self.generations):
-            graded = sorted(population, key=self._fitness, reverse=True)
-            best = graded[0]
-            self._log_generation(gen, best, self._fitness(best))
-            next_population = graded[:self.elitism]
-            while len(next_population) < self.population_size:
-                parent1 = self._select_parent(graded)
-                parent2 = self._select_parent(graded)
-                child = self._crossover(parent1, parent2)
-                if random.random() < self.mutation_rate:
-                    self._mutate(child)
-                next_population.append(child)
-            population = next_population
-        best = max(population, key=self._fitness)
-        self._log_generation(self.generations, best, self._fitness(best))
-        return best, self._fitness(best)
+            # Score each chromosome exactly once per generation; sorting,
+            # selection and logging all reuse the same values.
+            fitnesses = self._grade(self.pop)
+            best_idx = int(np.argmax(fitnesses))
+            best_fit = float(fitnesses[best_idx])
+            self._log_generation(gen, self.pop[best_idx], best_fit)
+            # Stop once the best fitness has plateaued; small portfolios
+            # typically converge well before the generation budget.
+            if best_fit - prev_best < 1e-9:
+                stale += 1
+                if self.patience and stale >= self.patience:
+                    break
+            else:
+                stale = 0
+                prev_best = best_fit
+            self._step(fitnesses, next_pop)
+            self.pop, next_pop = next_pop, self.pop
+        fitnesses = self._grade(self.pop)
+        best_idx = int(np.argmax(fitnesses))
+        best = self.pop[best_idx]
+        # Tag the final point with the generation actually reached so an
+        # early-stopped run keeps a contiguous per-generation series.
+        self._log_generation(gen + 1, best, float(fitnesses[best_idx]))
+        self._flush_points()
+        return best, float(fitnesses[best_idx])
 
-def parse_args():
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Genetic optimizer for portfolio allocation")
     for asset in ["vusa", "cndx", "aiq", "vaneckdefense", "eimi"]:
         parser.add_argument(f"--{asset}-return", type=float, required=True)
@@ -121,41 +304,103 @@ def parse_args():
     parser.add_argument("--mutation", type=float, default=0.1)
     parser.add_argument("--elitism", type=int, default=2)
     parser.add_argument("--selection", choices=["roulette", "tournament"], default="roulette")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for fitness evaluation")
+    parser.add_argument("--patience", type=int, default=20,
+                        help="generations without improvement before stopping (0 disables)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="RNG seed for reproducible runs")
     parser.add_argument("--influxdb-url", default="http://localhost:8086")
     parser.add_argument("--influxdb-token", default="mytoken")
     parser.add_argument("--influxdb-org", default="myorg")
     parser.add_argument("--influxdb-bucket", default="finance")
-    return parser.parse_args()
+    return parser
 
 
-def main():
-    args = parse_args()
-    # defaults for GA parameters
-    population = args.population
-    generations = args.generations
-    crossover = args.crossover
-    mutation = args.mutation
-    elitism = args.elitism
-    selection = args.selection
-
-    # Load configuration file if present
+# Built once at import so repeated parse_args calls (e.g. from a server
+# loop) skip the add_argument setup cost.
+_PARSER = _build_parser()
+
+
+def parse_args():
+    return _PARSER.parse_args()
+
+
+def load_config(path):
+    """Read GA and InfluxDB overrides from ``path`` as two plain dicts."""
+    ga_params = {}
+    influx_params = {}
     config = configparser.ConfigParser()
-    if os.path.exists(args.config):
-        config.read(args.config)
+    if os.path.exists(path):
+        config.read(path)
         if 'GA' in config:
             section = config['GA']
-            population = int(section.get('population', population))
-            generations = int(section.get('generations', generations))
-            crossover = float(section.get('crossover_rate', crossover))
-            mutation = float(section.get('mutation_rate', mutation))
-            selection = section.get('selection', selection)
-            elitism = int(section.get('elitism', elitism))
+            for key, cast in (('population', int), ('generations', int),
+                              ('crossover_rate', float), ('mutation_rate', float),
+                              ('selection', str), ('elitism', int),
+                              ('workers', int), ('patience', int),
+                              ('seed', int)):
+                if key in section:
+                    ga_params[key] = cast(section[key])
         if 'INFLUXDB' in config:
             section = config['INFLUXDB']
-            args.influxdb_url = section.get('url', args.influxdb_url)
-            args.influxdb_token = section.get('token', args.influxdb_token)
-            args.influxdb_org = section.get('org', args.influxdb_org)
-            args.influxdb_bucket = section.get('bucket', args.influxdb_bucket)
+            for key in ('url', 'token', 'org', 'bucket'):
+                if key in section:
+                    influx_params[key] = section[key]
+    return ga_params, influx_params
+
+
+def run_ga(assets: List[Asset], params: dict,
+           influx: Optional[InfluxDBClient] = None,
+           bucket: str = "", org: str = ""):
+    """Run the optimizer directly, bypassing argparse and config parsing.
+
+    ``params`` holds GA settings under the gen.conf key names; missing
+    keys fall back to the usual defaults.
+    """
+    ga = GeneticAlgorithm(
+        assets,
+        population_size=params.get('population', 50),
+        generations=params.get('generations', 200),
+        crossover_rate=params.get('crossover_rate', 0.7),
+        mutation_rate=params.get('mutation_rate', 0.1),
+        elitism=params.get('elitism', 2),
+        selection_type=params.get('selection', 'roulette'),
+        n_workers=params.get('workers', 1),
+        patience=params.get('patience', 20),
+        seed=params.get('seed'),
+        influx_client=influx,
+        bucket=bucket,
+        org=org,
+    )
+    return ga.run()
+
+
+def main():
+    args = parse_args()
+    # CLI values seed the parameters; the config file overrides them.
+    params = {
+        'population': args.population,
+        'generations': args.generations,
+        'crossover_rate': args.crossover,
+        'mutation_rate': args.mutation,
+        'elitism': args.elitism,
+        'selection': args.selection,
+        'workers': args.workers,
+        'patience': args.patience,
+    }
+    if args.seed is not None:
+        params['seed'] = args.seed
+    influx_params = {
+        'url': args.influxdb_url,
+        'token': args.influxdb_token,
+        'org': args.influxdb_org,
+        'bucket': args.influxdb_bucket,
+    }
+    ga_overrides, influx_overrides = load_config(args.config)
+    params.update(ga_overrides)
+    influx_params.update(influx_overrides)
+
     assets = [
         Asset("VUSA", args.vusa_return, args.vusa_risk),
         Asset("CNDX", args.cndx_return, args.cndx_risk),
@@ -167,27 +412,16 @@ def main():
     influx = None
     try:
         influx = InfluxDBClient(
-            url=args.influxdb_url,
-            token=args.influxdb_token,
-            org=args.influxdb_org,
+            url=influx_params['url'],
+            token=influx_params['token'],
+            org=influx_params['org'],
         )
     except Exception:
         influx = None
 
-    ga = GeneticAlgorithm(
-        assets,
-        population_size=population,
-        generations=generations,
-        crossover_rate=crossover,
-        mutation_rate=mutation,
-        elitism=elitism,
-        selection_type=selection,
-        influx_client=influx,
-        bucket=args.influxdb_bucket,
-        org=args.influxdb_org,
-    )
-
-    best, score = ga.run()
+    best, score = run_ga(assets, params, influx=influx,
+                         bucket=influx_params['bucket'],
+                         org=influx_params['org'])
     print("Best allocation:")
     for asset, weight in zip(assets, best):
         print(f"  {asset.name}: {weight:.4f}")
@@ -195,4 +429,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-